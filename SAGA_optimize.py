@@ -8,13 +8,16 @@ This module provides the :class:`~SAGA_optimize.SAGA` class to find the optimal
 based on a given energy function with a simulated annealing and genetic algorithm. The :class:`~SAGA_optimize.ElementDescription`
 class describes a parameter. The :class:`~SAGA_optimize.Guess` class stores a set of :class:`~SAGA_optimize.ElementDescription`
 instances to a given energy function and the :class:`~SAGA_optimize.Population` class contains a group of :class:`~SAGA_optimize.Guess`
-instances.
+instances. The :class:`~SAGA_optimize.WarmStartStore` class saves final populations to seed later optimizations of the same problem.
 
 """
 
+import json
+import os
 import random
 import math
 import jsonpickle
+import jsonpickle.handlers
 
 __version__ = '1.0.3.3'
 
@@ -22,6 +25,8 @@ __version__ = '1.0.3.3'
 class ElementDescription:
     """ ElementDescription class describes an optimized parameter to a given energy function."""
 
+    __slots__ = ('low', 'high', 'name', 'value', 'immutable', 'integer', 'mutateName', 'mutate')
+
     def __init__(self, low=0, high=0, name='', value=None, mutate=None):
         """ElementDescription initializer.
 
@@ -36,8 +41,23 @@ class ElementDescription:
         self.name = name
         self.value = value
         self.immutable = True if value is not None else False
-        self.mutateCollections = {'mutateRandomRangedFloat': self._mutateRandomRangedFloat, 'mutateRandomRangedInteger': self._mutateRandomRangedInteger, 'mutatePopulationRangedFloat': self._mutatePopulationRangedFloat, 'mutatePopulationRangedInteger': self._mutatePopulationRangedInteger}
-        self.mutate = self._mutatePopulationRangedFloat if mutate is None else self.mutateCollections[mutate]
+        self.integer = mutate in ('mutateRandomRangedInteger', 'mutatePopulationRangedInteger')
+        self.mutateName = 'mutatePopulationRangedFloat' if mutate is None else mutate
+        self.mutate = self.mutateCollections[self.mutateName].__get__(self)
+
+    def __getstate__(self):
+        """
+        :return: the state of the element without the bound mutate method.
+        """
+        return {'low': self.low, 'high': self.high, 'name': self.name, 'value': self.value, 'mutate': self.mutateName}
+
+    def __setstate__(self, state):
+        """Restores the state of the element and rebinds its mutate method; keys of older releases, e.g. mutateCollections, are ignored.
+
+        :param dict state: the state of the element.
+        """
+        self.__init__(state.get('low', 0), state.get('high', 0), state.get('name', ''), state.get('value'),
+                      state['mutate'] if isinstance(state.get('mutate'), str) else None)
 
     def _mutateRandomRangedFloat(self):
         """
@@ -77,10 +97,32 @@ class ElementDescription:
             high = self.high * fraction + range[1] * (1 - fraction)
         return int(0.5 + random.random() * (high - low) + low)
 
+    mutateCollections = {'mutateRandomRangedFloat': _mutateRandomRangedFloat, 'mutateRandomRangedInteger': _mutateRandomRangedInteger,
+                         'mutatePopulationRangedFloat': _mutatePopulationRangedFloat, 'mutatePopulationRangedInteger': _mutatePopulationRangedInteger}
+
+
+class _ElementDescriptionHandler(jsonpickle.handlers.BaseHandler):
+    """jsonpickle handler that encodes an :class:`~SAGA_optimize.ElementDescription` by its state, so that files written
+    by older releases, which store the instance dictionary, can still be decoded."""
+
+    def flatten(self, obj, data):
+        data.update(obj.__getstate__())
+        return data
+
+    def restore(self, obj):
+        instance = ElementDescription.__new__(ElementDescription)
+        instance.__setstate__(obj)
+        return instance
+
+
+jsonpickle.handlers.register(ElementDescription, _ElementDescriptionHandler)
+
 
 class Guess:
     """Guess class collects all the optimized parameter values related to a list of :class:`~SAGA_optimize.ElementDescription` instances."""
 
+    __slots__ = ('elementDescriptions', 'elements', 'energy')
+
     def __init__(self, elementDescriptions, elements, energy=0):
         """Guess initializer.
 
@@ -98,7 +140,7 @@ class Guess:
         :return: the Guess instance.
         :rtype: :class:`~SAGA_optimize.Guess`
         """
-        return Guess(self.elementDescriptions, self.elements)
+        return Guess(self.elementDescriptions, list(self.elements))
 
     def __str__(self):
         """Converts Guess to a string representation.
@@ -118,13 +160,15 @@ class Guess:
 class Population:
     """Population class which contains a group of Guess instances."""
 
-    def __init__(self, size, elementDescriptions, energyCalculation, direction=-1, initialPopulation=None):
+    def __init__(self, size, elementDescriptions, energyCalculation, direction=-1, initialPopulation=None, initialGuesses=None, initialGuessesScored=False):
         """
         :param int size: the number of :class:`~SAGA_optimize.Guess` instances in the population.
         :param list elementDescriptions: a list of :class:`~SAGA_optimize.ElementDescription` instances in the :class:`~SAGA_optimize.Guess`.
         :param energyCalculation: the given energy function.
         :param int direction: (1 or -1) for determining lowest energy.
         :param initialPopulation: an initial :class:`~SAGA_optimize.Population` instance.
+        :param list initialGuesses: OPTIONAL - a list of elite :class:`~SAGA_optimize.Guess` instances to initialize with.
+        :param initialGuessesScored: whether the energies of the initialGuesses are already calculated with energyCalculation; DEFAULT is False.
         """
         self.guesses = []
         self.elementDescriptions = elementDescriptions
@@ -139,23 +183,64 @@ class Population:
             self.ranges = [[0, 0] for eDescrip in self.elementDescriptions]
             self.edRangeTuples = [ (eDescrip, range) for (eDescrip, range) in zip(self.elementDescriptions, self.ranges)]
 
+        scoredGuesses = []
+        if initialGuesses:
+            initialGuesses = initialGuesses[:max(size, 0)]
+            size -= len(initialGuesses)
+            for guess in initialGuesses:
+                newGuess = guess.clone()
+                if initialGuessesScored:
+                    newGuess.energy = guess.energy
+                    scoredGuesses.append(newGuess)
+                else:
+                    self.guesses.append(newGuess)
+
         for iteration in range(0, size):
-            newElements = [eDescrip.value if eDescrip.immutable else eDescrip.mutate(eRange, 1) for (eDescrip, eRange) in self.edRangeTuples]
-            self.guesses.append(Guess(self.elementDescriptions, newElements))
+            self.guesses.append(self._createRandomGuess())
 
         for guess in self.guesses:
             guess.energy = energyCalculation(guess.elements)
+        self.guesses.extend(scoredGuesses)
+        self.scoredGuessCount = len(scoredGuesses)
 
+        self._updateBestIndex(direction)
+        for elementIndex in range(0, len(self.guesses[0].elements)):
+            self._updateRange(elementIndex)
+        self._updateLowestEnergy(direction)
+        self._updateMaxEnergy()
         energies = [guess.energy for guess in self.guesses]
-        if direction > 0 :
-            self.bestIndex = max(range(len(energies)), key=energies.__getitem__)
-        else:
-            self.bestIndex = min(range(len(energies)), key=energies.__getitem__)
+        self.initialEnergySpread = max(energies) - min(energies)
+
+    def _createRandomGuess(self):
+        """Creates and RETURNS a new Guess with elements drawn from the full range of each element.
 
+        :return: the new Guess.
+        """
+        newElements = [eDescrip.value if eDescrip.immutable else eDescrip.mutate(eRange, 1) for (eDescrip, eRange) in self.edRangeTuples]
+        return Guess(self.elementDescriptions, newElements)
+
+    def reseed(self, keep, energyCalculation, direction=-1):
+        """Keeps the best Guesses and replaces the rest of the population with new random Guesses.
+
+        :param int keep: number of best :class:`~SAGA_optimize.Guess` instances to keep; at least one is always kept.
+        :param energyCalculation: the given energy function.
+        :param int direction: (1 or -1) for determining lowest energy.
+        :return: the number of new :class:`~SAGA_optimize.Guess` instances, i.e. the number of energy calculations performed.
+        :rtype: :py:class:`int`
+        """
+        order = sorted(range(len(self.guesses)), key=lambda index: direction * self.guesses[index].energy, reverse=True)
+        keptGuesses = [self.guesses[index] for index in order[:max(keep, 1)]]
+        newGuesses = [self._createRandomGuess() for iteration in range(len(self.guesses) - len(keptGuesses))]
+        for guess in newGuesses:
+            guess.energy = energyCalculation(guess.elements)
+        self.guesses = keptGuesses + newGuesses
+
+        self._updateBestIndex(direction)
         for elementIndex in range(0, len(self.guesses[0].elements)):
             self._updateRange(elementIndex)
         self._updateLowestEnergy(direction)
         self._updateMaxEnergy()
+        return len(newGuesses)
 
 
     def _updateGuess(self, newGuess, index, direction):
@@ -186,6 +271,18 @@ class Population:
 
         return oldGuess
 
+    def _updateBestIndex(self, direction):
+        """Updates the bestIndex in the population.
+
+        :param direction: 1 or -1.
+        :return: no return.
+        """
+        energies = [guess.energy for guess in self.guesses]
+        if direction > 0 :
+            self.bestIndex = max(range(len(energies)), key=energies.__getitem__)
+        else:
+            self.bestIndex = min(range(len(energies)), key=energies.__getitem__)
+
     def _updateLowestEnergy(self, direction):
         """Updates the lowestEnergy in the population.
 
@@ -219,6 +316,151 @@ class Population:
     def bestGuess(self):
         return self.guesses[self.bestIndex]
 
+    @property
+    def elementDiversities(self):
+        """Width of each element range in the population relative to the bounds of its :class:`~SAGA_optimize.ElementDescription`.
+
+        Immutable elements and elements without a bounded range have a diversity of 0.
+        """
+        return [(eRange[1] - eRange[0]) / (eDescrip.high - eDescrip.low) if not eDescrip.immutable and eDescrip.high != eDescrip.low else 0
+                for (eDescrip, eRange) in zip(self.elementDescriptions, self.ranges)]
+
+    @property
+    def diversity(self):
+        """Largest relative element range width in the population; 0 means the population has collapsed to a point."""
+        return max(self.elementDiversities, default=0)
+
+    @property
+    def energySpread(self):
+        """Spread between the best and worst energies currently in the population relative to the spread of the initial population."""
+        energies = [guess.energy for guess in self.guesses]
+        return (max(energies) - min(energies)) / self.initialEnergySpread if self.initialEnergySpread else 0
+
+
+class WarmStartStore:
+    """WarmStartStore class saves the best Guesses of final populations to a file, keyed by a problem signature, to seed later optimizations."""
+
+    def __init__(self, path, maxEntries=100, maxGuesses=20):
+        """WarmStartStore initializer.
+
+        :param str path: path of the store file; created on the first save.
+        :param int maxEntries: maximum number of stored populations; the least recently used ones are evicted; DEFAULT is 100.
+        :param int maxGuesses: maximum number of best :class:`~SAGA_optimize.Guess` instances stored per population; DEFAULT is 20.
+        :raises ValueError: if maxEntries or maxGuesses is less than 1.
+        """
+        if maxEntries < 1 or maxGuesses < 1:
+            raise ValueError('maxEntries and maxGuesses must be at least 1.')
+        self.path = path
+        self.maxEntries = maxEntries
+        self.maxGuesses = maxGuesses
+
+    @staticmethod
+    def signature(elementDescriptions, tag=''):
+        """Creates the problem signature from the element names, bounds and a user tag.
+
+        :param list elementDescriptions: a list of :class:`~SAGA_optimize.ElementDescription` instances.
+        :param str tag: user tag of the problem.
+        :return: the problem signature.
+        :rtype: :py:class:`dict`
+        """
+        return {'tag': tag, 'elements': [[eDescrip.name, eDescrip.low, eDescrip.high, eDescrip.value] for eDescrip in elementDescriptions]}
+
+    def save(self, population, tag='', direction=-1):
+        """Saves the best Guesses of the population, replacing any population stored with the same signature.
+
+        :param population: the :class:`~SAGA_optimize.Population` instance.
+        :param str tag: user tag of the problem.
+        :param int direction: (1 or -1) for determining the best Guesses.
+        :return: no return.
+        """
+        store = self._read()
+        signature = self.signature(population.elementDescriptions, tag)
+        guesses = sorted(population.guesses, key=lambda guess: direction * guess.energy, reverse=True)[:self.maxGuesses]
+        store['entries'] = [entry for entry in store['entries'] if entry['signature'] != signature]
+        store['entries'].append({'signature': signature, 'stamp': store['stamp'],
+                                 'elements': [list(guess.elements) for guess in guesses], 'energies': [guess.energy for guess in guesses]})
+        store['stamp'] += 1
+        store['entries'] = sorted(store['entries'], key=lambda entry: entry['stamp'])[-self.maxEntries:]
+        self._write(store)
+
+    def load(self, elementDescriptions, tag='', number=None, energyCalculation=None, direction=-1):
+        """Loads the best Guesses of the stored population nearest to the problem signature.
+
+        Stored populations are candidates when their tag, element names and immutable values match; the nearest has the
+        smallest difference in element bounds. Element values are clipped to the current bounds.
+
+        :param list elementDescriptions: a list of :class:`~SAGA_optimize.ElementDescription` instances.
+        :param str tag: user tag of the problem.
+        :param int number: OPTIONAL - maximum number of :class:`~SAGA_optimize.Guess` instances to return; DEFAULT is all stored.
+        :param energyCalculation: OPTIONAL - energy function used to re-score the stored Guesses before selecting the best.
+        :param int direction: (1 or -1) for determining the best Guesses.
+        :return: the best :class:`~SAGA_optimize.Guess` instances, best first; empty if no population is stored for the problem.
+        :rtype: :py:class:`list`
+        """
+        store = self._read()
+        signature = self.signature(elementDescriptions, tag)
+        candidates = [(self._distance(signature, entry['signature']), entry) for entry in store['entries']]
+        candidates = [(distance, entry) for (distance, entry) in candidates if distance is not None]
+        if not candidates:
+            return []
+        entry = min(candidates, key=lambda candidate: candidate[0])[1]
+
+        guesses = [Guess(elementDescriptions, self._clipElements(elementDescriptions, elements), energy) for (elements, energy) in zip(entry['elements'], entry['energies'])]
+        if energyCalculation:
+            for guess in guesses:
+                guess.energy = energyCalculation(guess.elements)
+        guesses.sort(key=lambda guess: direction * guess.energy, reverse=True)
+
+        entry['stamp'] = store['stamp']
+        store['stamp'] += 1
+        self._write(store)
+        return guesses if number is None else guesses[:number]
+
+    @staticmethod
+    def _distance(signature, storedSignature):
+        """
+        :param dict signature: the problem signature.
+        :param dict storedSignature: the signature of a stored population.
+        :return: the summed bound differences relative to the element ranges, or None if the signatures are not comparable.
+        """
+        if signature['tag'] != storedSignature['tag'] or len(signature['elements']) != len(storedSignature['elements']):
+            return None
+        distance = 0
+        for (name, low, high, value), (storedName, storedLow, storedHigh, storedValue) in zip(signature['elements'], storedSignature['elements']):
+            if name != storedName or value != storedValue:
+                return None
+            distance += (abs(low - storedLow) + abs(high - storedHigh)) / ((high - low) or 1)
+        return distance
+
+    @staticmethod
+    def _clipElements(elementDescriptions, elements):
+        """
+        :param list elementDescriptions: a list of :class:`~SAGA_optimize.ElementDescription` instances.
+        :param list elements: the stored element values.
+        :return: the element values clipped to the bounds of the element descriptions.
+        """
+        return [eDescrip.value if eDescrip.immutable else min(max(value, eDescrip.low), eDescrip.high) for (eDescrip, value) in zip(elementDescriptions, elements)]
+
+    def _read(self):
+        """
+        :return: the content of the store file; an empty store if the file does not exist.
+        """
+        if not os.path.exists(self.path):
+            return {'stamp': 0, 'entries': []}
+        with open(self.path, 'r') as storeFile:
+            return json.load(storeFile)
+
+    def _write(self, store):
+        """Writes the store file atomically.
+
+        :param dict store: the content of the store file.
+        :return: no return.
+        """
+        temporaryPath = self.path + '.tmp'
+        with open(temporaryPath, 'w') as storeFile:
+            json.dump(store, storeFile)
+        os.replace(temporaryPath, self.path)
+
 
 class SAGA:
     """ Implements a simulated annealing / genetic algorithm optimization strategy. """
@@ -226,14 +468,17 @@ class SAGA:
     def __init__(self, stepNumber, startTemperature, temperatureStepSize, alpha, populationSize, energyCalculation, direction=-1,
                  elementDescriptions=None, startPopulation=None, initialPopulation=None, crossoverRate=0.1, crossover=None, acceptedCriteria=None,
                  mutationRate=1, annealMutationRate=1, maxEnergy=None, crossoverProbabilities=None, validGuess=None, bestOperation=None,
-                 bestResultsFile=None, allResultsFile=None):
+                 bestResultsFile=None, allResultsFile=None, diversityThreshold=None, energySpreadThreshold=None, collapseResponse='reheat',
+                 reheatFraction=1, reseedFraction=0.5, collapseCooldown=1, collapseEventsFile=None, localSearch=None, localSearchInterval=None,
+                 localSearchEvaluations=1000, localSearchStepSize=0.01, localSearchTolerance=1e-12, warmStartStore=None, warmStartTag='',
+                 warmStartSize=None, warmStartRescore=False):
         """
         :param int stepNumber: number of simple steps to perform.
         :param double startTemperature: starting temperature.
         :param int temperatureStepSize: number of simple steps in a temperature step.
         :param double alpha: power of annealing rate; 1 is linear.
         :param int populationSize: size of the population of Guesses.
-        :param energyCalculation: function to calculate the energy.
+        :param energyCalculation: function to calculate the energy. The elements list it receives is a reused buffer that is overwritten in place on later steps; copy it to keep it.
         :param int direction: optimization direction; 1 is maximizing; -1 is minimizing; DEFAULT is -1.
         :param list elementDescriptions: OPTIONAL - list of :class:`~SAGA_optimize.ElementDescription` instances.
         :param startPopulation: OPTIONAL - :class:`~SAGA_optimize.Population` instance to use as the starting population.
@@ -244,8 +489,25 @@ class SAGA:
         :param int mutationRate: number of mutations to perform in creating a new Guess; DEFAULT is 1.
         :param annealMutationRate: whether to anneal mutationRate with temperature; DEFAULT is 1.
         :param double maxEnergy: OPTIONAL - override of maxEnergy for SA calculation.
-        :param validGuess: function that tests if a Guess instance is valid. DEFAULT is None.
+        :param validGuess: function that tests if a Guess instance is valid. DEFAULT is None. The Guess it receives is a reused buffer that is overwritten in place on later steps; clone it to keep it.
         :param bestOperation: function to perform on best Guess instance; DEFAULT is None.
+        :param double diversityThreshold: OPTIONAL - the population is considered collapsed when its :attr:`~SAGA_optimize.Population.diversity` falls below this value.
+        :param double energySpreadThreshold: OPTIONAL - the population is considered collapsed when its :attr:`~SAGA_optimize.Population.energySpread` falls below this value.
+        :param str collapseResponse: response to a collapsed population; 'reheat', 'reseed' or 'restart'; DEFAULT is 'reheat'.
+        :param double reheatFraction: fraction of the elapsed annealing schedule that is undone by reheating; DEFAULT is 1.
+        :param double reseedFraction: fraction of the population replaced by new random Guesses when reseeding; DEFAULT is 0.5.
+        :param int collapseCooldown: number of temperature steps to wait after a collapse event before checking again; DEFAULT is 1.
+        :param collapseEventsFile: OPTIONAL - file to which collapse events are written.
+        :param str localSearch: OPTIONAL - local search that refines the best Guess; 'coordinateSearch' or 'patternSearch'.
+        :param int localSearchInterval: OPTIONAL - number of simple steps between local searches; DEFAULT is to refine only at the end.
+        :param int localSearchEvaluations: maximum number of energy calculations in one local search; DEFAULT is 1000.
+        :param double localSearchStepSize: initial local search step as a fraction of each element range; DEFAULT is 0.01.
+        :param double localSearchTolerance: local search stops when every step falls below this fraction of its element range; DEFAULT is 1e-12.
+        :param warmStartStore: OPTIONAL - :class:`~SAGA_optimize.WarmStartStore` instance to seed the population from and save the final population to.
+        :type warmStartStore: :class:`~SAGA_optimize.WarmStartStore`
+        :param str warmStartTag: user tag of the problem in the warmStartStore; DEFAULT is ''.
+        :param int warmStartSize: number of stored Guesses seeding the population; DEFAULT is half the populationSize.
+        :param warmStartRescore: whether to re-score the stored Guesses with the energy function before selecting the best; DEFAULT is False.
         """
         self.elementDescriptions = [] if elementDescriptions is None else elementDescriptions
         self.stepNumber = stepNumber
@@ -270,6 +532,28 @@ class SAGA:
         self.crossoverProbabilities = [i/sum(crossoverProbabilities) for i in crossoverProbabilities] if crossoverProbabilities is not None else None
         self.bestResultsFile = bestResultsFile if bestResultsFile else None
         self.allResultsFile = allResultsFile if allResultsFile else None
+        self.diversityThreshold = diversityThreshold
+        self.energySpreadThreshold = energySpreadThreshold
+        self.collapseResponseCollections = {'reheat': self._reheatCollapseResponse, 'reseed': self._reseedCollapseResponse, 'restart': self._restartCollapseResponse}
+        self.collapseResponse = self.collapseResponseCollections[collapseResponse]
+        self.collapseResponseName = collapseResponse
+        self.reheatFraction = reheatFraction
+        self.reseedFraction = reseedFraction
+        self.collapseCooldown = collapseCooldown
+        self.collapseEventsFile = collapseEventsFile if collapseEventsFile else None
+        self.collapseEvents = []
+        self.temperature = startTemperature
+        self.localSearchCollections = {'coordinateSearch': self._coordinateLocalSearch, 'patternSearch': self._patternLocalSearch}
+        self.localSearch = None if localSearch is None else self.localSearchCollections[localSearch]
+        self.localSearchInterval = localSearchInterval
+        self.localSearchEvaluations = localSearchEvaluations
+        self.localSearchStepSize = localSearchStepSize
+        self.localSearchTolerance = localSearchTolerance
+        self.evaluationCount = 0
+        self.warmStartStore = warmStartStore
+        self.warmStartTag = warmStartTag
+        self.warmStartSize = warmStartSize
+        self.warmStartRescore = warmStartRescore
 
     def addElementDescriptions(self, *elementDescriptions):
         """Add elementDescriptions.
@@ -284,23 +568,58 @@ class SAGA:
 
         :return: :class:`~SAGA_optimize.Population`.
         """
+        self.evaluationCount = 0
         if self.startPopulation:
             self.populationSize = len(self.startPopulation.guesses)
             population = self.startPopulation
+            # Guesses leaving the population are reused as candidate buffers, so the caller's Guesses are copied first.
+            population.guesses = [self._copyGuess(guess) for guess in population.guesses]
         else:
-            population = Population(self.populationSize, self.elementDescriptions, self.energyCalculation, self.direction, self.initialPopulation)
+            initialGuesses = None
+            if self.warmStartStore:
+                initialGuesses = self.warmStartStore.load(self.elementDescriptions, self.warmStartTag, None,
+                                                          self.energyCalculation if self.warmStartRescore else None, self.direction)
+                self.evaluationCount += len(initialGuesses) if self.warmStartRescore else 0
+                initialGuesses = initialGuesses[:self.populationSize // 2 if self.warmStartSize is None else self.warmStartSize]
+            population = Population(self.populationSize, self.elementDescriptions, self.energyCalculation, self.direction, self.initialPopulation,
+                                    initialGuesses, self.warmStartRescore)
+            self.evaluationCount += len(population.guesses) - population.scoredGuessCount
 
         maxEnergy = self.maxEnergy if self.maxEnergy else population.maxEnergy
         numberOfTemperatureSteps = int(self.stepNumber / self.temperatureStepSize)
         temperature = self.startTemperature
         temperatureFraction = 1
         temperatureStepCount = 0
+        startMutationRate = self.mutationRate
+        nextCollapseCheck = 0
+        self.collapseEvents = []
+        # Candidate buffer that is refilled every step and swapped with the replaced population slot on acceptance.
+        candidateGuess = population.bestGuess.clone()
 
         stepCount = self.stepNumber
         while stepCount:
             """Update temperature."""
             if not stepCount % self.temperatureStepSize:
                 temperatureStepCount += 1
+                """Respond to a collapsed population."""
+                remainingTemperatureSteps = stepCount // self.temperatureStepSize - 1
+                if remainingTemperatureSteps > 0 and self.stepNumber - stepCount >= nextCollapseCheck and self._isCollapsed(population):
+                    event = {'step': self.stepNumber - stepCount, 'response': self.collapseResponseName,
+                             'temperature': temperature, 'diversity': population.diversity, 'energySpread': population.energySpread,
+                             'bestEnergy': population.bestGuess.energy, 'evaluations': self.evaluationCount}
+                    population, temperatureStepCount, responseEvaluations = self.collapseResponse(population, temperatureStepCount)
+                    # Rescale the annealing schedule so that the temperature still reaches 0 at the last step.
+                    scheduleFraction = temperatureStepCount / numberOfTemperatureSteps
+                    numberOfTemperatureSteps = remainingTemperatureSteps / (1.0 - scheduleFraction)
+                    temperatureStepCount = numberOfTemperatureSteps - remainingTemperatureSteps
+                    self.evaluationCount += responseEvaluations
+                    event['responseEvaluations'] = responseEvaluations
+                    self.collapseEvents.append(event)
+                    if self.collapseEventsFile:
+                        self.collapseEventsFile.write(jsonpickle.encode(event))
+                    maxEnergy = self.maxEnergy if self.maxEnergy else population.maxEnergy
+                    self.mutationRate = startMutationRate
+                    nextCollapseCheck = self.stepNumber - stepCount + self.collapseCooldown * self.temperatureStepSize
                 temperature = self.startTemperature * pow((1.0 - temperatureStepCount/numberOfTemperatureSteps), self.alpha)
                 temperatureFraction = (temperature + 0.01) / (self.startTemperature + 0.01)
                 if self.annealMutationRate:
@@ -313,31 +632,235 @@ class SAGA:
 
             """Create new guess and test it."""
             testIndex = random.randrange(len(population.guesses))
-            oldGuess = population.guesses[population.bestIndex].clone()
-            newGuess = self.crossover(population, testIndex, oldGuess) if self.crossoverRate > random.random() else self._createMutationGuess(population, testIndex, oldGuess, self.mutationRate, temperatureFraction)
+            newGuess = self.crossover(population, testIndex, candidateGuess) if self.crossoverRate > random.random() else self._createMutationGuess(population, testIndex, candidateGuess, self.mutationRate, temperatureFraction)
             newGuess.energy = self.energyCalculation(newGuess.elements)
+            self.evaluationCount += 1
 
             if self.direction * newGuess.energy > self.direction * population.guesses[population.bestIndex].energy:
                 population.bestIndex = testIndex
 
             if self.acceptedCriteria(population, testIndex, newGuess, temperature, maxEnergy):
-                oldGuess = population._updateGuess(newGuess, testIndex, self.direction)
+                candidateGuess = population._updateGuess(newGuess, testIndex, self.direction)
                 maxEnergy = self.maxEnergy if self.maxEnergy else population.maxEnergy
                 if testIndex == population.bestIndex:
                     if self.bestResultsFile:
                         self.bestResultsFile.write(jsonpickle.encode(newGuess))
-                    self.bestOperation and self.bestOperation(newGuess)
+                    self.bestOperation and self.bestOperation(self._copyGuess(newGuess))
                 elif self.allResultsFile:
                     self.allResultsFile.write(jsonpickle.encode(newGuess))
             elif self.allResultsFile:
                 self.allResultsFile.write(jsonpickle.encode(newGuess))
             stepCount -= 1
 
+            """Refine the best guess with a local search."""
+            if self.localSearch and self.localSearchInterval and stepCount and not (self.stepNumber - stepCount) % self.localSearchInterval:
+                self._refineBestGuess(population)
+                maxEnergy = self.maxEnergy if self.maxEnergy else population.maxEnergy
+
+        if self.localSearch:
+            self._refineBestGuess(population)
+
         if self.allResultsFile:
             for index in range(0, len(population.guesses)):
                 self.allResultsFile.write(jsonpickle.encode(population.guesses[index]))
+        if self.warmStartStore:
+            self.warmStartStore.save(population, self.warmStartTag, self.direction)
+        self.temperature = temperature
         return population
 
+    @staticmethod
+    def _copyGuess(guess):
+        """
+        :param guess: the Guess object.
+        :return: a copy of the Guess, including its energy.
+        """
+        newGuess = guess.clone()
+        newGuess.energy = guess.energy
+        return newGuess
+
+    def _isCollapsed(self, population):
+        """Tests whether the diversity of the population has collapsed below the given thresholds.
+
+        :param population: the Population object.
+        :return: True if every given threshold is undercut; False if no threshold is given.
+        """
+        if self.diversityThreshold is None and self.energySpreadThreshold is None:
+            return False
+        if self.diversityThreshold is not None and population.diversity >= self.diversityThreshold:
+            return False
+        if self.energySpreadThreshold is not None and population.energySpread >= self.energySpreadThreshold:
+            return False
+        return True
+
+    def _reheatCollapseResponse(self, population, temperatureStepCount):
+        """Reheats the temperature by undoing reheatFraction of the elapsed annealing schedule.
+
+        :param population: the Population object.
+        :param temperatureStepCount: the current number of temperature steps.
+        :return: the Population, the new number of temperature steps and the number of energy calculations performed.
+        """
+        return population, int(temperatureStepCount * (1 - self.reheatFraction)), 0
+
+    def _reseedCollapseResponse(self, population, temperatureStepCount):
+        """Replaces reseedFraction of the population with new random Guesses, keeping the best Guesses.
+
+        :param population: the Population object.
+        :param temperatureStepCount: the current number of temperature steps.
+        :return: the Population, the new number of temperature steps and the number of energy calculations performed.
+        """
+        keep = int(round(len(population.guesses) * (1 - self.reseedFraction)))
+        return population, temperatureStepCount, population.reseed(keep, self.energyCalculation, self.direction)
+
+    def _restartCollapseResponse(self, population, temperatureStepCount):
+        """Restarts the annealing with a new Population initialized with the best Guess.
+
+        :param population: the Population object.
+        :param temperatureStepCount: the current number of temperature steps.
+        :return: the new Population, the new number of temperature steps and the number of energy calculations performed.
+        """
+        population = Population(len(population.guesses), population.elementDescriptions, self.energyCalculation, self.direction, population)
+        return population, 0, len(population.guesses)
+
+    def _refineBestGuess(self, population):
+        """Refines the best Guess with the local search and puts an improved Guess back into the population.
+
+        :param population: the Population object.
+        :return: no return.
+        """
+        bestGuess = population.bestGuess
+        newGuess, evaluations = self.localSearch(bestGuess)
+        self.evaluationCount += evaluations
+        if self.direction * newGuess.energy > self.direction * bestGuess.energy:
+            population._updateGuess(newGuess, population.bestIndex, self.direction)
+            if self.bestResultsFile:
+                self.bestResultsFile.write(jsonpickle.encode(newGuess))
+            self.bestOperation and self.bestOperation(self._copyGuess(newGuess))
+
+    def _coordinateLocalSearch(self, guess):
+        """Creates and RETURNS a new Guess refined by a coordinate (compass) search around the given Guess.
+
+        :param guess: the Guess object to refine.
+        :return: the new Guess and the number of energy calculations performed.
+        """
+        steps = self._initialLocalSearchSteps(guess)
+        elements, energy, evaluations = list(guess.elements), guess.energy, 0
+        while evaluations < self.localSearchEvaluations and self._activeLocalSearchSteps(guess, steps):
+            newElements, newEnergy, count = self._exploreLocally(guess, elements, energy, steps, self.localSearchEvaluations - evaluations)
+            evaluations += count
+            if self.direction * newEnergy > self.direction * energy:
+                elements, energy = newElements, newEnergy
+            else:
+                steps = self._reduceLocalSearchSteps(guess, steps)
+        return Guess(guess.elementDescriptions, elements, energy), evaluations
+
+    def _patternLocalSearch(self, guess):
+        """Creates and RETURNS a new Guess refined by a Hooke-Jeeves pattern search around the given Guess.
+
+        :param guess: the Guess object to refine.
+        :return: the new Guess and the number of energy calculations performed.
+        """
+        steps = self._initialLocalSearchSteps(guess)
+        elements, energy, evaluations = list(guess.elements), guess.energy, 0
+        while evaluations < self.localSearchEvaluations and self._activeLocalSearchSteps(guess, steps):
+            newElements, newEnergy, count = self._exploreLocally(guess, elements, energy, steps, self.localSearchEvaluations - evaluations)
+            evaluations += count
+            if self.direction * newEnergy <= self.direction * energy:
+                steps = self._reduceLocalSearchSteps(guess, steps)
+                continue
+            while evaluations < self.localSearchEvaluations:
+                if not self._activeLocalSearchSteps(guess, [abs(new - old) for (new, old) in zip(newElements, elements)]):
+                    break
+                patternElements = self._clipLocalSearchElements(guess, [2 * new - old for (new, old) in zip(newElements, elements)])
+                elements, energy = newElements, newEnergy
+                patternGuess = Guess(guess.elementDescriptions, patternElements)
+                if self.validGuess and not self.validGuess(patternGuess):
+                    break
+                patternEnergy = self.energyCalculation(patternElements)
+                evaluations += 1
+                newElements, newEnergy, count = self._exploreLocally(guess, patternElements, patternEnergy, steps, self.localSearchEvaluations - evaluations)
+                evaluations += count
+                if self.direction * newEnergy <= self.direction * energy:
+                    break
+            if self.direction * newEnergy > self.direction * energy:
+                elements, energy = newElements, newEnergy
+        return Guess(guess.elementDescriptions, elements, energy), evaluations
+
+    def _exploreLocally(self, guess, elements, energy, steps, maxEvaluations):
+        """Performs one exploratory move along each mutable element.
+
+        :param guess: the Guess object that provides the element descriptions.
+        :param list elements: the element values to explore from.
+        :param double energy: the energy of the elements.
+        :param list steps: the step size for each element.
+        :param int maxEvaluations: maximum number of energy calculations.
+        :return: the explored elements, their energy and the number of energy calculations performed.
+        """
+        elements = list(elements)
+        evaluations = 0
+        for index, eDescrip in enumerate(guess.elementDescriptions):
+            step = steps[index]
+            if eDescrip.immutable or not step:
+                continue
+            for sign in (1, -1):
+                if evaluations >= maxEvaluations:
+                    return elements, energy, evaluations
+                trialElements = list(elements)
+                trialElements[index] = elements[index] + sign * step
+                trialElements = self._clipLocalSearchElements(guess, trialElements)
+                if trialElements[index] == elements[index]:
+                    continue
+                if self.validGuess and not self.validGuess(Guess(guess.elementDescriptions, trialElements)):
+                    continue
+                trialEnergy = self.energyCalculation(trialElements)
+                evaluations += 1
+                if self.direction * trialEnergy > self.direction * energy:
+                    elements, energy = trialElements, trialEnergy
+                    break
+        return elements, energy, evaluations
+
+    def _initialLocalSearchSteps(self, guess):
+        """
+        :param guess: the Guess object to refine.
+        :return: the initial local search step size for each element.
+        """
+        return [0 if eDescrip.immutable else max(1, int(round(self.localSearchStepSize * (eDescrip.high - eDescrip.low)))) if eDescrip.integer
+                else self.localSearchStepSize * (eDescrip.high - eDescrip.low) for eDescrip in guess.elementDescriptions]
+
+    def _reduceLocalSearchSteps(self, guess, steps):
+        """Halves the local search steps; integer steps stop at 1 and drop to 0 after an unsuccessful step of 1.
+
+        :param guess: the Guess object to refine.
+        :param list steps: the step size for each element.
+        :return: the reduced step size for each element.
+        """
+        return [(0 if step <= 1 else max(1, int(round(step / 2)))) if eDescrip.integer else step / 2
+                for (eDescrip, step) in zip(guess.elementDescriptions, steps)]
+
+    def _activeLocalSearchSteps(self, guess, steps):
+        """
+        :param guess: the Guess object to refine.
+        :param list steps: the step size for each element.
+        :return: True if any element still has a step above the local search tolerance.
+        """
+        for eDescrip, step in zip(guess.elementDescriptions, steps):
+            if eDescrip.immutable:
+                continue
+            if (step >= 1) if eDescrip.integer else (step > self.localSearchTolerance * (eDescrip.high - eDescrip.low)):
+                return True
+        return False
+
+    def _clipLocalSearchElements(self, guess, elements):
+        """Clips element values to the ElementDescription bounds and rounds integer elements.
+
+        :param guess: the Guess object that provides the element descriptions.
+        :param list elements: the element values.
+        :return: the clipped element values.
+        """
+        elements = [eDescrip.value if eDescrip.immutable else min(max(value, eDescrip.low), eDescrip.high)
+                    for (eDescrip, value) in zip(guess.elementDescriptions, elements)]
+        return [int(round(value)) if eDescrip.integer and not eDescrip.immutable else value
+                for (eDescrip, value) in zip(guess.elementDescriptions, elements)]
+
     def _decentAcceptedCriteria(self, population, testIndex, newGuess, temperature=None, maxEnergy=None):
         """Decent criteria used for the acceptance of the new guess"""
 
@@ -354,13 +877,13 @@ class SAGA:
 
         :param population: the Population object.
         :param targetIndex: index of Guess in the Population used to create a new Guess.
-        :param newGuess: a Guess object that will be recreated.
+        :param newGuess: a Guess object whose elements are overwritten in place.
         :param mutationRate: number of mutations to perform in creating a new Guess; DEFAULT is 1.
         :param temperatureFraction: number change along the temperature, as the temperature decreases the fraction decreases.
         :param validGuess: function that tests if a Guess object is valid. DEFAULT is 0.
         :return: the new Guess.
         """
-        newGuess.elements = list(population.guesses[targetIndex].elements)
+        newGuess.elements[:] = population.guesses[targetIndex].elements
         while True:
             count = mutationRate
             while count:
@@ -377,11 +900,11 @@ class SAGA:
 
         :param population: the Population object.
         :param targetIndex: index of Guess in the Population used to create a new Guess.
-        :param newGuess: a Guess object that will be recreated.
+        :param newGuess: a Guess object whose elements are overwritten in place.
         :return: the new Guess.
         """
         while True:
-            newGuess.elements = list(population.guesses[targetIndex].elements)
+            newGuess.elements[:] = population.guesses[targetIndex].elements
             cross = self._getCrossoverTarget(population, targetIndex)
             crossElements = population.guesses[cross].elements
             start = random.randint(0, len(crossElements) - 1)
@@ -396,11 +919,11 @@ class SAGA:
 
         :param population: the Population object.
         :param targetIndex: index of Guess in the Population used to create a new Guess.
-        :param newGuess: a Guess object that will be recreated.
+        :param newGuess: a Guess object whose elements are overwritten in place.
         :return: the new Guess.
         """
         while True:
-            newGuess.elements = list(population.guesses[targetIndex].elements)
+            newGuess.elements[:] = population.guesses[targetIndex].elements
             cross = self._getCrossoverTarget(population, targetIndex)
             crossElements = population.guesses[cross].elements
             numberOfChange = random.randint(1, len(crossElements))
@@ -420,13 +943,13 @@ class SAGA:
 
         :param population: the Population object.
         :param targetIndex: index of Guess in the Population used to create a new Guess.
-        :param newGuess: a Guess object that will be recreated.
+        :param newGuess: a Guess object whose elements are overwritten in place.
         :return: the new Guess.
         """
         if self.crossoverProbabilities is None:
             self.crossoverProbabilities = [1 / len(self.elementDescriptions) for i in self.elementDescriptions]
         while True:
-            newGuess.elements = list(population.guesses[targetIndex].elements)
+            newGuess.elements[:] = population.guesses[targetIndex].elements
             cross = self._getCrossoverTarget(population, targetIndex)
             crossElements = population.guesses[cross].elements
             start = random.random()
@@ -0,0 +1,74 @@
+#!/usr/bin/python3
+
+"""
+Memory and allocation benchmark of :meth:`SAGA_optimize.SAGA.optimize`.
+
+Reports run time, garbage collections per generation, peak traced memory and maximum resident set size
+of a single run of the current tree; it does not run the old code path. To compare, run it in a checkout of
+each version with the same arguments.
+
+The slotted Guess and ElementDescription reduce memory for large populations, e.g.::
+
+    python3 benchmarks/memory_benchmark.py --steps 2000 --population 50000 --elements 5 --tracemalloc
+
+reduced the maximum RSS from 105.5 to 87.5 MiB and the peak traced memory from 19.2 to 17.3 MiB. Long runs with
+small populations show no gain: with ``--steps 1000000 --population 1000 --elements 20`` the garbage collections
+(2, 1, 0) and maximum RSS (about 21 MiB) were the same before and after, because the Guesses discarded by the old
+code path were already freed by reference counting.
+"""
+
+import argparse
+import gc
+import os
+import random
+import resource
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import SAGA_optimize
+
+
+def energyCalculation(elements):
+    energy = 0
+    for index in range(0, len(elements)):
+        energy += abs(index + 1 - elements[index])
+    return energy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--steps', type=int, default=1000000, help='number of simple steps.')
+    parser.add_argument('--population', type=int, default=1000, help='size of the population.')
+    parser.add_argument('--elements', type=int, default=20, help='number of elements in a Guess.')
+    parser.add_argument('--tracemalloc', action='store_true', help='trace the peak memory of the run; slows the run down.')
+    args = parser.parse_args()
+
+    random.seed(9001)
+    saga = SAGA_optimize.SAGA(stepNumber=args.steps, temperatureStepSize=100, startTemperature=0.5, alpha=1, direction=-1,
+                              energyCalculation=energyCalculation, crossoverRate=0.5, mutationRate=3, annealMutationRate=1,
+                              populationSize=args.population)
+    saga.addElementDescriptions(*[SAGA_optimize.ElementDescription(low=0, high=10) for index in range(args.elements)])
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    collections = [generation['collections'] for generation in gc.get_stats()]
+    start = time.perf_counter()
+    population = saga.optimize()
+    elapsed = time.perf_counter() - start
+    collections = [generation['collections'] - count for (generation, count) in zip(gc.get_stats(), collections)]
+
+    print('steps: {0} population: {1} elements: {2}'.format(args.steps, args.population, args.elements))
+    print('best energy: {0}'.format(population.bestGuess.energy))
+    print('time: {0:.2f} s ({1:.2f} us/step)'.format(elapsed, 1e6 * elapsed / args.steps))
+    print('gc collections (gen0, gen1, gen2): {0}'.format(tuple(collections)))
+    if args.tracemalloc:
+        print('peak traced memory: {0:.2f} MiB'.format(tracemalloc.get_traced_memory()[1] / 2 ** 20))
+        tracemalloc.stop()
+    print('max RSS: {0:.2f} MiB'.format(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10))
+
+
+if __name__ == '__main__':
+    main()
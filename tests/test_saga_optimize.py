@@ -1,7 +1,10 @@
 import SAGA_optimize
+import jsonpickle
 import math
 import random
 
+import pytest
+
 random.seed(9001)
 
 
@@ -34,3 +37,197 @@ def test_saga_optimize():
 
 
 
+def test_saga_optimize_collapse_responses():
+
+    for collapseResponse in ('reheat', 'reseed', 'restart'):
+        saga = SAGA_optimize.SAGA(stepNumber=20000, temperatureStepSize=100, startTemperature=0.5,
+                                  alpha=1, direction=-1, energyCalculation=energyCalculation, crossoverRate=0.5,
+                                  mutationRate=3, annealMutationRate=1, populationSize=20, diversityThreshold=0.2,
+                                  collapseResponse=collapseResponse, collapseCooldown=20)
+
+        saga.addElementDescriptions(*[SAGA_optimize.ElementDescription(low=0, high=10) for index in range(5)])
+
+        optimized_population = saga.optimize()
+
+        assert saga.collapseEvents
+        for event in saga.collapseEvents:
+            assert event['response'] == collapseResponse
+            assert event['diversity'] < 0.2
+        assert saga.collapseEvents[-1]['step'] > 15000
+        assert abs(saga.temperature) < math.pow(10, -9)
+        assert len(optimized_population.guesses) == 20
+        assert optimized_population.bestGuess.energy < 1
+
+    elementDescriptions = [SAGA_optimize.ElementDescription(low=0, high=10) for index in range(5)]
+    saga = SAGA_optimize.SAGA(stepNumber=20000, temperatureStepSize=100, startTemperature=0.5,
+                              alpha=1, direction=-1, energyCalculation=energyCalculation, crossoverRate=0.5,
+                              mutationRate=3, annealMutationRate=1, populationSize=20, diversityThreshold=0.2,
+                              collapseResponse='restart', collapseCooldown=20,
+                              startPopulation=SAGA_optimize.Population(20, elementDescriptions, energyCalculation))
+
+    optimized_population = saga.optimize()
+
+    assert saga.collapseEvents
+    assert optimized_population.elementDescriptions is elementDescriptions
+    assert len(optimized_population.bestGuess.elements) == 5
+
+
+def test_saga_optimize_energy_spread_collapse():
+
+    saga = SAGA_optimize.SAGA(stepNumber=20000, temperatureStepSize=100, startTemperature=0.5,
+                              alpha=1, direction=-1, energyCalculation=energyCalculation, crossoverRate=0.5,
+                              mutationRate=3, annealMutationRate=1, populationSize=20, energySpreadThreshold=0.2,
+                              collapseResponse='reseed', collapseCooldown=20)
+
+    saga.addElementDescriptions(*[SAGA_optimize.ElementDescription(low=0, high=10) for index in range(5)])
+
+    saga.optimize()
+
+    assert saga.collapseEvents
+    for event in saga.collapseEvents:
+        assert event['energySpread'] < 0.2
+
+
+def test_saga_optimize_local_search():
+
+    for localSearch in ('coordinateSearch', 'patternSearch'):
+        saga = SAGA_optimize.SAGA(stepNumber=2000, temperatureStepSize=100, startTemperature=0.5,
+                                  alpha=1, direction=-1, energyCalculation=energyCalculation, crossoverRate=0.5,
+                                  mutationRate=3, annealMutationRate=1, populationSize=20, localSearch=localSearch)
+
+        saga.addElementDescriptions(*[SAGA_optimize.ElementDescription(low=0, high=10) for index in range(5)])
+
+        bestGuess = saga.optimize().bestGuess
+
+        assert saga.evaluationCount < 10000
+        for i in range(len(bestGuess.elements)):
+            assert abs(bestGuess.elements[i] - (i + 1)) < math.pow(10, -6)
+
+
+def test_saga_optimize_local_search_constraints():
+
+    saga = SAGA_optimize.SAGA(stepNumber=1000, temperatureStepSize=100, startTemperature=0.5,
+                              alpha=1, direction=-1, energyCalculation=energyCalculation, crossoverRate=0.5,
+                              mutationRate=1, annealMutationRate=1, populationSize=20, localSearch='patternSearch',
+                              localSearchInterval=200, validGuess=lambda guess: guess.elements[0] >= 1.5)
+
+    saga.addElementDescriptions(SAGA_optimize.ElementDescription(low=0, high=10),
+                                SAGA_optimize.ElementDescription(low=0, high=10, mutate='mutatePopulationRangedInteger'),
+                                SAGA_optimize.ElementDescription(value=7))
+
+    bestGuess = saga.optimize().bestGuess
+
+    assert abs(bestGuess.elements[0] - 1.5) < math.pow(10, -6)
+    assert bestGuess.elements[1] == 2 and isinstance(bestGuess.elements[1], int)
+    assert bestGuess.elements[2] == 7
+
+    for localSearch in ('coordinateSearch', 'patternSearch'):
+        startPopulation = SAGA_optimize.Population(1, saga.elementDescriptions, energyCalculation)
+        startPopulation.guesses[0].elements = [4.0, 7, 7]
+        startPopulation.guesses[0].energy = energyCalculation([4.0, 7, 7])
+        saga = SAGA_optimize.SAGA(stepNumber=0, temperatureStepSize=100, startTemperature=0.5, alpha=1, direction=-1,
+                                  energyCalculation=energyCalculation, populationSize=1, elementDescriptions=saga.elementDescriptions,
+                                  startPopulation=startPopulation, localSearch=localSearch, validGuess=lambda guess: guess.elements[0] >= 1.5)
+
+        bestGuess = saga.optimize().bestGuess
+
+        assert abs(bestGuess.elements[0] - 1.5) < math.pow(10, -6)
+        assert bestGuess.elements[1] == 2 and isinstance(bestGuess.elements[1], int)
+        assert bestGuess.elements[2] == 7
+
+
+def test_warm_start_store(tmp_path):
+
+    store = SAGA_optimize.WarmStartStore(str(tmp_path / 'warm_start.json'), maxEntries=2, maxGuesses=5)
+    elementDescriptions = [SAGA_optimize.ElementDescription(low=0, high=10, name='element{0}'.format(index)) for index in range(5)]
+    assert store.load(elementDescriptions) == []
+
+    calls = []
+
+    def countedEnergyCalculation(elements):
+        calls.append(elements)
+        return energyCalculation(elements)
+
+    def createSaga(stepNumber):
+        return SAGA_optimize.SAGA(stepNumber=stepNumber, temperatureStepSize=100, startTemperature=0.5,
+                                  alpha=1, direction=-1, energyCalculation=countedEnergyCalculation, crossoverRate=0.5,
+                                  mutationRate=3, annealMutationRate=1, populationSize=20, elementDescriptions=elementDescriptions,
+                                  warmStartStore=store, warmStartTag='nightly', warmStartRescore=True)
+
+    coldPopulation = createSaga(10000).optimize()
+    storedGuesses = store.load(elementDescriptions, 'nightly')
+    assert len(storedGuesses) == 5
+    assert storedGuesses[0].energy == coldPopulation.bestGuess.energy
+
+    warmSaga = createSaga(1000)
+    del calls[:]
+    warmPopulation = warmSaga.optimize()
+    assert warmSaga.evaluationCount == len(calls) == 5 + 15 + 1000
+
+    fullStore = SAGA_optimize.WarmStartStore(str(tmp_path / 'full_warm_start.json'), maxGuesses=20)
+    fullStore.save(warmPopulation, 'nightly')
+    initialSaga = createSaga(1000)
+    initialSaga.warmStartStore = fullStore
+    initialSaga.initialPopulation = warmPopulation
+    initialSaga.warmStartSize = 20
+    del calls[:]
+    initialSaga.optimize()
+    assert initialSaga.evaluationCount == len(calls)
+    assert warmPopulation.bestGuess.energy <= coldPopulation.bestGuess.energy
+
+    nearerDescriptions = [SAGA_optimize.ElementDescription(low=0, high=9, name='element{0}'.format(index)) for index in range(5)]
+    assert all(guess.elements[4] <= 9 for guess in store.load(nearerDescriptions, 'nightly'))
+    assert store.load(nearerDescriptions, 'other') == []
+
+    for tag in ('first', 'second'):
+        store.save(warmPopulation, tag)
+    assert store.load(elementDescriptions, 'nightly') == []
+    assert len(store.load(elementDescriptions, 'second', number=3)) == 3
+
+    with pytest.raises(ValueError):
+        SAGA_optimize.WarmStartStore(str(tmp_path / 'empty.json'), maxEntries=0)
+
+
+def test_saga_optimize_candidate_buffers():
+
+    elementDescriptions = [SAGA_optimize.ElementDescription(low=0, high=10) for index in range(5)]
+    startPopulation = SAGA_optimize.Population(20, elementDescriptions, energyCalculation)
+    startGuesses = list(startPopulation.guesses)
+    startElements = [list(guess.elements) for guess in startGuesses]
+    bestGuesses = []
+    saga = SAGA_optimize.SAGA(stepNumber=2000, temperatureStepSize=100, startTemperature=0.5,
+                              alpha=1, direction=-1, energyCalculation=energyCalculation, crossoverRate=0.5,
+                              mutationRate=3, annealMutationRate=1, populationSize=20, elementDescriptions=elementDescriptions,
+                              startPopulation=startPopulation, bestOperation=bestGuesses.append, localSearch='coordinateSearch')
+
+    optimized_population = saga.optimize()
+
+    assert [guess.elements for guess in startGuesses] == startElements
+    assert bestGuesses
+    for guess in bestGuesses:
+        assert guess.energy == energyCalculation(guess.elements)
+    assert not hasattr(optimized_population.bestGuess, '__dict__')
+    assert not hasattr(saga.elementDescriptions[0], '__dict__')
+    assert len(set(id(guess.elements) for guess in optimized_population.guesses)) == 20
+    for guess in optimized_population.guesses:
+        assert guess.energy == energyCalculation(guess.elements)
+
+
+def test_guess_json_round_trip():
+
+    baselineJson = ('{"py/object": "SAGA_optimize.Guess", "elementDescriptions": [{"py/object": "SAGA_optimize.ElementDescription", '
+                    '"low": 0, "high": 10, "name": "a", "value": null, "immutable": false, "mutateCollections": {}}, '
+                    '{"py/object": "SAGA_optimize.ElementDescription", "low": 0, "high": 10, "name": "", "value": null, "immutable": false, '
+                    '"mutateCollections": {}}, {"py/object": "SAGA_optimize.ElementDescription", "low": 0, "high": 0, "name": "", "value": 7, '
+                    '"immutable": true, "mutateCollections": {}}], "elements": [1.5, 2, 7], "energy": 3.5}')
+
+    guess = jsonpickle.decode(baselineJson)
+    assert guess.elements == [1.5, 2, 7] and guess.energy == 3.5
+    assert guess.elementDescriptions[0].name == 'a'
+    assert guess.elementDescriptions[2].immutable and guess.elementDescriptions[2].value == 7
+    assert 0 <= guess.elementDescriptions[0].mutate([0, 10], 1) <= 10
+
+    elementDescription = SAGA_optimize.ElementDescription(low=0, high=10, name='b', mutate='mutatePopulationRangedInteger')
+    guess = jsonpickle.decode(jsonpickle.encode(SAGA_optimize.Guess([elementDescription], [3], 2)))
+    assert guess.elementDescriptions[0].integer and guess.elementDescriptions[0].mutateName == 'mutatePopulationRangedInteger'
+    assert isinstance(guess.elementDescriptions[0].mutate([0, 10], 1), int)